@@ -35,6 +35,17 @@ def serialize_post(doc: Dict[str, Any]) -> Dict[str, Any]:
     }
 
 
+def rendered_html(doc: Dict[str, Any]) -> str:
+    """
+    Return the post's HTML, rendered once when the post was written.
+    Posts saved before `content_html` existed are rendered on the fly.
+    """
+    html = doc.get("content_html")
+    if html is None:
+        html = markdown.markdown(doc.get("content", ""))
+    return html
+
+
 # ---------- Startup / shutdown ----------
 
 
@@ -165,7 +176,7 @@ class BlogApp(App):
         post = serialize_post(doc)
         user = await self._get_current_user()
 
-        html = markdown.markdown(post["content"])
+        html = rendered_html(doc)
         return await self._render_template(
             "post.html",
             title=post["title"],
@@ -250,7 +261,10 @@ class BlogApp(App):
         - POST → create post (requires login)
         """
         if self.request.method == "GET":
-            cursor = self.posts.find({}).sort("created_at", -1)
+            # The listing never returns rendered HTML, so don't fetch it
+            cursor = self.posts.find({}, projection={"content_html": 0}).sort(
+                "created_at", -1
+            )
             posts = [serialize_post(doc) async for doc in cursor]
             return {"posts": posts}
 
@@ -277,6 +291,7 @@ class BlogApp(App):
             doc = {
                 "title": title,
                 "content": content,
+                "content_html": markdown.markdown(content),
                 "created_at": datetime.utcnow(),
                 "author_id": user_id,
                 "author_username": username,
@@ -308,7 +323,7 @@ class BlogApp(App):
 
         if self.request.method == "GET":
             post = serialize_post(doc)
-            post["html"] = markdown.markdown(post["content"])
+            post["html"] = rendered_html(doc)
             return post
 
         if self.request.method in ("PATCH", "PUT"):
@@ -334,6 +349,7 @@ class BlogApp(App):
                 if not content:
                     return 400, {"error": "content cannot be empty."}
                 updates["content"] = content
+                updates["content_html"] = markdown.markdown(content)
 
             if not updates:
                 return 400, {"error": "Nothing to update."}
@@ -343,7 +359,7 @@ class BlogApp(App):
             await self.posts.update_one({"_id": oid}, {"$set": updates})
             updated = await self.posts.find_one({"_id": oid})
             post = serialize_post(updated)
-            post["html"] = markdown.markdown(post["content"])
+            post["html"] = rendered_html(updated)
             return post
 
         if self.request.method == "DELETE":
@@ -358,14 +374,14 @@ class BlogApp(App):
 
 
 app = BlogApp(session_backend=MkvSessionBackend(mongo_uri=MONGO_URI, db_name=DB_NAME))
-app.middlewares.append(
-    MongoRateLimitMiddleware(
-        mongo_uri=MONGO_URI,
-        db_name=DB_NAME,
-        allowed_hosts=None,  # don't enforce host allowlist, change in prod
-        trust_proxy_headers=False,  # change in prod
-        require_cf_ray=False,
-    )
+rate_limiter = MongoRateLimitMiddleware(
+    mongo_uri=MONGO_URI,
+    db_name=DB_NAME,
+    allowed_hosts=None,  # don't enforce host allowlist, change in prod
+    trust_proxy_headers=False,  # change in prod
+    require_cf_ray=False,
 )
+app.middlewares.append(rate_limiter)
 app.startup_handlers.append(init_db)
+app.startup_handlers.append(rate_limiter.create_indexes)
 app.shutdown_handlers.append(close_db)
@@ -1,13 +1,15 @@
 from __future__ import annotations
 
 import ipaddress
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
 from typing import Set
 
 from pymongo import AsyncMongoClient, ReturnDocument
 from micropie import HttpMiddleware
 
 
+@lru_cache(maxsize=4096)
 def _valid_ip(value: str | None) -> str | None:
     try:
         return str(ipaddress.ip_address(value.strip()))
@@ -50,15 +52,31 @@ class MongoRateLimitMiddleware(HttpMiddleware):
         trust_proxy_headers: bool = True,
         require_cf_ray: bool = True,
     ):
-        self.client = AsyncMongoClient(mongo_uri)
+        self.client = AsyncMongoClient(mongo_uri, tz_aware=True)
         self.db = self.client[db_name]
         self.collection = self.db[collection_name]
+        # Window lengths as timedeltas, built once instead of per request
+        self._window = timedelta(seconds=self.WINDOW_SECONDS)
+        self._perma_window = timedelta(hours=self.PERMA_WINDOW_HOURS)
+        self._block_for = timedelta(seconds=self.BLOCK_FOR_SECONDS)
 
         # Security / proxy config
         self.allowed_hosts = allowed_hosts or set()
         self.trust_proxy_headers = trust_proxy_headers
         self.require_cf_ray = require_cf_ray
 
+    async def create_indexes(self) -> None:
+        """
+        Expire per-IP documents that have been idle for a full violation
+        lookback window, so the collection does not grow with every IP ever
+        seen. Permanently blocked IPs are kept. Run once at startup.
+        """
+        await self.collection.create_index(
+            "window_start",
+            expireAfterSeconds=self.PERMA_WINDOW_HOURS * 3600,
+            partialFilterExpression={"permanent_blocked": False},
+        )
+
     # ---------------------------------------------------------
     # Real client IP resolution (for Cloudflare + Heroku or similar setups)
     # ---------------------------------------------------------
@@ -106,10 +124,10 @@ class MongoRateLimitMiddleware(HttpMiddleware):
 
     async def before_request(self, request):
         client_ip = self._client_ip(request)
-        now = datetime.utcnow()
+        now = datetime.now(timezone.utc)
 
-        window_start_cutoff = now - timedelta(seconds=self.WINDOW_SECONDS)
-        perma_window_cutoff = now - timedelta(hours=self.PERMA_WINDOW_HOURS)
+        window_start_cutoff = now - self._window
+        perma_window_cutoff = now - self._perma_window
 
         key = client_ip
 
@@ -242,7 +260,7 @@ class MongoRateLimitMiddleware(HttpMiddleware):
                                         },
                                     ]
                                 },
-                                now + timedelta(seconds=self.BLOCK_FOR_SECONDS),
+                                now + self._block_for,
                                 "$blocked_until",
                             ]
                         }
@@ -35,6 +35,13 @@ class BaseRouter:
     def __init__(self):
         # Map route paths to (methods/subprotocol, compiled regex, handler, param_types)
         self.routes: Dict[str, Tuple[Any, re.Pattern, Callable, List[Type]]] = {}
+        # Routes bucketed by their first path segment, so a request is only
+        # matched against routes that can possibly fit it. Routes whose first
+        # segment is a parameter are candidates for every path.
+        self._by_segment: Dict[
+            str, List[Tuple[Any, re.Pattern, Callable, List[Type]]]
+        ] = {}
+        self._param_first: List[Tuple[Any, re.Pattern, Callable, List[Type]]] = []
         self._param_types = {
             "int": (int, r"(\d+)"),
             "str": (str, r"([^/]+)"),
@@ -85,6 +92,48 @@ class BaseRouter:
             handler,
             param_types,
         )
+        self._rebuild_index()
+
+    @staticmethod
+    def _first_segment(path: str) -> str:
+        """Return the first segment of a path ("/api/users" -> "api")."""
+        return path[1:].partition("/")[0]
+
+    @staticmethod
+    def _is_literal(segment: str) -> bool:
+        """
+        Whether a route segment only matches itself. Parameters and regex
+        metacharacters (e.g. "/docs?" also matches "/doc") can match other
+        request segments, so such routes are candidates for every path.
+        """
+        return re.escape(segment) == segment
+
+    def _rebuild_index(self) -> None:
+        """Rebuild the first-segment buckets, keeping registration order."""
+        segments = {path: self._first_segment(path) for path in self.routes}
+        literal = {
+            path: self._is_literal(segment) for path, segment in segments.items()
+        }
+        self._param_first = [
+            route for path, route in self.routes.items() if not literal[path]
+        ]
+        self._by_segment = {
+            segment: [
+                route
+                for path, route in self.routes.items()
+                if segments[path] == segment or not literal[path]
+            ]
+            for segment in set(segments.values())
+            if self._is_literal(segment)
+        }
+
+    def candidates(
+        self, path: str
+    ) -> List[Tuple[Any, re.Pattern, Callable, List[Type]]]:
+        """
+        Return the routes that may match `path`, in registration order.
+        """
+        return self._by_segment.get(self._first_segment(path), self._param_first)
 
     def list_routes(self) -> List[Dict[str, Any]]:
         """
@@ -140,12 +189,7 @@ class ExplicitRouter(HttpMiddleware):
             Dictionary with response details to short-circuit, or None to continue.
         """
         path = request.scope["path"]
-        for route_path, (
-            methods,
-            pattern,
-            handler,
-            param_types,
-        ) in self.router.routes.items():
+        for methods, pattern, handler, param_types in self.router.candidates(path):
             if request.method not in methods:
                 continue
             match = pattern.match(path)
@@ -206,12 +250,7 @@ class WebSocketExplicitRouter(WebSocketMiddleware):
             Dictionary with close details to reject, or None to continue.
         """
         path = request.scope["path"]
-        for route_path, (
-            subprotocol,
-            pattern,
-            handler,
-            param_types,
-        ) in self.router.routes.items():
+        for subprotocol, pattern, handler, param_types in self.router.candidates(path):
             match = pattern.match(path)
             if match:
                 try:
@@ -297,14 +336,20 @@ class ExplicitApp(App):
         self._register_routes()
 
     def _register_routes(self):
-        """Register HTTP and WebSocket routes from decorated methods."""
+        """
+        Register HTTP and WebSocket routes from decorated methods. Handler
+        metadata is cached up front so the first request to each route
+        doesn't pay for signature introspection.
+        """
         for name, method in self.__class__.__dict__.items():
             if hasattr(method, "_route"):
                 path, methods = method._route
                 self.router.add_route(path, getattr(self, name), methods)
+                self._get_handler_info(getattr(self, name))
             if hasattr(method, "_ws_route"):
                 path, subprotocol = method._ws_route
                 self.ws_router.add_route(path, getattr(self, name), subprotocol)
+                self._get_handler_info(getattr(self, name))
 
     def list_routes(self) -> Dict[str, List[Dict[str, Any]]]:
         """
@@ -1,10 +1,87 @@
+import asyncio  # Used to run blocking file writes in a worker thread
+import hashlib  # Used to checksum uploads while they are written
 import os  # Used for file path handling and directory creation
-import aiofiles  # Asynchronous file I/O operations
+import stat  # Used to check that a download is a regular file
+from concurrent.futures import ThreadPoolExecutor  # Worker threads for disk I/O
 from micropie import App  # Import the base App class from MicroPie
 
 # Ensure the "uploads" directory exists; create it if it doesn't
 os.makedirs("uploads", exist_ok=True)
 
+# Collect this many bytes of upload chunks before handing them to a worker
+# thread, so the thread hop is paid once per batch instead of once per chunk
+WRITE_BATCH_SIZE = 1 << 20  # 1 MiB
+# os.writev() accepts at most this many buffers per call on common platforms
+MAX_BATCH_CHUNKS = 1024
+# Flush uploads to disk before responding (slower, but survives a crash)
+SYNC_UPLOADS = os.getenv("SYNC_UPLOADS") == "1"
+
+
+# The upload form never changes, so build and encode it once at import time
+INDEX_HTML = b"""<form action="/upload" method="post" enctype="multipart/form-data">
+    <input type="file" name="file" required>
+    <input type="submit" value="Upload">
+    </form>"""
+
+
+def upload_path(filename):
+    """
+    Map a client-supplied filename to a path inside "uploads", or None if
+    nothing usable is left once directory parts are stripped.
+    """
+    name = os.path.basename(filename)
+    if name in ("", ".", ".."):
+        return None
+    return os.path.join("uploads", name)
+
+
+def write_chunks(fd, chunks, digest):
+    """
+    Write a batch of chunks to a file descriptor with one writev() syscall
+    (runs in a worker thread). Finishes with plain writes on a short write.
+    The batch is also fed to `digest` in the same thread, so the checksum
+    costs no extra pass over the file.
+    """
+    for chunk in chunks:
+        digest.update(chunk)
+    written = os.writev(fd, chunks)
+    if written < sum(map(len, chunks)):
+        rest = memoryview(b"".join(chunks))[written:]
+        while rest:
+            rest = rest[os.write(fd, rest) :]
+
+
+async def configure_executor():
+    """
+    ASGI startup handler: size the default thread pool used by
+    asyncio.to_thread for concurrent uploads. Python's default of
+    min(32, cpu_count + 4) threads caps how many uploads can be writing
+    at once; tune UPLOAD_THREADS per worker process.
+    """
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(
+        ThreadPoolExecutor(
+            max_workers=int(os.getenv("UPLOAD_THREADS", "64")),
+            thread_name_prefix="upload",
+        )
+    )
+
+
+def close_file(fd):
+    """
+    Close a finished upload (runs in a worker thread). Uploads are rarely
+    read back right away, so tell the kernel to drop their cached pages
+    and leave the page cache to hotter data. Dirty pages can only be
+    dropped once written, so this is most effective with SYNC_UPLOADS.
+    """
+    try:
+        if SYNC_UPLOADS:
+            getattr(os, "fdatasync", os.fsync)(fd)
+        if hasattr(os, "posix_fadvise"):
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+    finally:
+        os.close(fd)
+
 
 class Root(App):
     """
@@ -17,16 +94,15 @@ class Root(App):
         Serve a simple HTML form that lets the user choose a
         file and submit it via POST to /upload.
         """
-        return """<form action="/upload" method="post" enctype="multipart/form-data">
-            <input type="file" name="file" required>
-            <input type="submit" value="Upload">
-            </form>"""
+        return INDEX_HTML
 
     async def upload(self, file):
         """
         Handle the uploaded file from the client:
         - Saves the file to disk in the "uploads" directory.
-        - Uses aiofiles to write the file asynchronously, in chunks.
+        - Batches incoming chunks and writes each batch with a single
+          worker-thread call, keeping the event loop free.
+        - Computes the SHA-256 of the file alongside the write.
 
         `file` is a dictionary with:
             'filename': The original filename of the uploaded file.
@@ -37,18 +113,70 @@ class Root(App):
         """
 
         # Construct a safe path to save the uploaded file
-        filepath = os.path.join("uploads", file["filename"])
+        filepath = upload_path(file["filename"])
+        if filepath is None:
+            # Drain the stream so the multipart parser can finish
+            while await file["content"].get() is not None:
+                pass
+            return 400, "Invalid filename"
 
-        # Open the destination file asynchronously for writing
-        async with aiofiles.open(filepath, "wb") as f:
-            # Read and write the file in chunks
+        # Open the destination file in a worker thread. A raw descriptor is
+        # used so each batch goes straight to writev() without extra copying
+        fd = await asyncio.to_thread(
+            os.open, filepath, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644
+        )
+        digest = hashlib.sha256()
+        try:
+            pending = []  # Chunks received but not yet written
+            pending_size = 0
+            # Read the file in chunks as they arrive, so at most one batch
+            # is held in memory at a time regardless of upload size
             while chunk := await file["content"].get():
-                print(f"Chunk size: {len(chunk)} bytes")  # <-- log here
-                await f.write(chunk)
+                pending.append(chunk)
+                pending_size += len(chunk)
+                if pending_size >= WRITE_BATCH_SIZE or len(pending) >= MAX_BATCH_CHUNKS:
+                    await asyncio.to_thread(write_chunks, fd, pending, digest)
+                    pending = []
+                    pending_size = 0
+            if pending:
+                await asyncio.to_thread(write_chunks, fd, pending, digest)
+        finally:
+            await asyncio.to_thread(close_file, fd)
+
+        # Return a confirmation response with the filename and checksum
+        return 200, f"Uploaded {file['filename']} (sha256 {digest.hexdigest()})"
+
+    async def download(self, filename):
+        """
+        Stream a previously uploaded file back to the client in 64KB
+        chunks, so large files are never read into memory at once.
+        """
+        filepath = upload_path(filename)
+        try:
+            st = os.stat(filepath) if filepath else None
+        except OSError:
+            st = None
+        if st is None or not stat.S_ISREG(st.st_mode):
+            return 404, "File not found"
+
+        async def stream_file():
+            f = await asyncio.to_thread(open, filepath, "rb")
+            try:
+                while chunk := await asyncio.to_thread(f.read, 65536):
+                    yield chunk
+            finally:
+                await asyncio.to_thread(f.close)
 
-        # Return a confirmation response with the uploaded filename
-        return 200, f"Uploaded {file['filename']}"
+        return (
+            200,
+            stream_file(),
+            [
+                ("Content-Type", "application/octet-stream"),
+                ("Content-Length", str(st.st_size)),
+            ],
+        )
 
 
 # Instantiate the app
 app = Root()
+app.startup_handlers.append(configure_executor)
@@ -1,8 +1,30 @@
 from micropie import App
-from pickledb import AsyncPickleDB
 from uuid import uuid4
 
-db = AsyncPickleDB("pastes.db")
+import aiosqlite
+
+DB_PATH = "pastes.db"
+
+
+async def open_db():
+    """
+    ASGI startup handler: open one shared connection for all requests.
+    WAL lets readers run while a write is in progress.
+    """
+    app.db = await aiosqlite.connect(DB_PATH)
+    await app.db.execute("PRAGMA journal_mode=WAL")
+    await app.db.execute("PRAGMA synchronous=NORMAL")
+    await app.db.execute(
+        "CREATE TABLE IF NOT EXISTS pastes (key TEXT PRIMARY KEY, value TEXT)"
+    )
+    await app.db.commit()
+
+
+async def close_db():
+    """
+    ASGI shutdown handler: close the shared connection.
+    """
+    await app.db.close()
 
 
 class PasteApp(App):
@@ -11,7 +33,10 @@ class PasteApp(App):
             # Get content from JSON or form, depending on the Content-Type
             content = self.request.form("content")
             pid = str(uuid4())
-            await db.aset(pid, content)
+            await self.db.execute(
+                "INSERT INTO pastes (key, value) VALUES (?, ?)", (pid, content)
+            )
+            await self.db.commit()
             return {
                 "status": "success",
                 "action": "post",
@@ -20,28 +45,32 @@ class PasteApp(App):
             }
 
         elif self.request.method == "DELETE":
-            await db.aremove(pid)
+            await self.db.execute("DELETE FROM pastes WHERE key = ?", (pid,))
+            await self.db.commit()
             return {"status": "success", "action": "delete", "paste_id": pid}
 
         elif self.request.method == "GET":
             if pid:
-                paste = await db.aget(pid)
-                if paste is None:
-                    return 404, orjson.dumps(
-                        {"status": "fail", "error": "Paste not found"}
-                    )
+                async with self.db.execute(
+                    "SELECT value FROM pastes WHERE key = ?", (pid,)
+                ) as cursor:
+                    row = await cursor.fetchone()
+                if row is None:
+                    return 404, {"status": "fail", "error": "Paste not found"}
                 return {
                     "status": "success",
                     "action": "get",
                     "paste_id": pid,
-                    "content": paste,
+                    "content": row[0],
                 }
 
-            all_keys = await db.aall()
-            all_pastes = [
-                {"paste_id": key, "content": await db.aget(key)} for key in all_keys
-            ]
-            return 302, {"status": "success", "action": "get all", "pastes": all_pastes}
+            async with self.db.execute("SELECT key, value FROM pastes") as cursor:
+                all_pastes = [
+                    {"paste_id": key, "content": value} async for key, value in cursor
+                ]
+            return {"status": "success", "action": "get all", "pastes": all_pastes}
 
 
 app = PasteApp()
+app.startup_handlers.append(open_db)
+app.shutdown_handlers.append(close_db)
@@ -1,4 +1,5 @@
-from datetime import datetime, timedelta
+import time
+from datetime import datetime, timedelta, timezone
 from micropie import App, HttpMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
 from pymongo.errors import PyMongoError
@@ -23,26 +24,79 @@ class MongoRateLimitMiddleware(HttpMiddleware):
     PERMA_WINDOW_HOURS = 24  # lookback window for permanent block
     PERMA_BLOCK_AFTER = 10  # violations in window before permanent block
 
+    BLOCK_CACHE_SIZE = 10_000  # blocked IPs remembered in-process
+    PERMA_CACHE_SECONDS = 60  # re-check permanent blocks in Mongo this often
+
     def __init__(
         self,
         mongo_uri: str,
         db_name: str = "vegy_security",
         collection_name: str = "rate_limits_global",
     ):
-        self.client = motor.motor_asyncio.AsyncIOMotorClient(mongo_uri)
+        self.client = AsyncIOMotorClient(mongo_uri, tz_aware=True)
         self.db = self.client[db_name]
         self.collection = self.db[collection_name]
+        # Window lengths as timedeltas, built once instead of per request
+        self._window = timedelta(seconds=self.WINDOW_SECONDS)
+        self._perma_window = timedelta(hours=self.PERMA_WINDOW_HOURS)
+        self._block_for = timedelta(seconds=self.BLOCK_FOR_SECONDS)
+        # IP -> (monotonic expiry, response). Blocked clients are the ones
+        # that hammer the server, so answer them without a Mongo round trip.
+        self._blocked = {}
+
+    def _remember_block(self, client_ip, response, seconds):
+        """Serve `response` to `client_ip` from memory for `seconds`."""
+        if len(self._blocked) >= self.BLOCK_CACHE_SIZE:
+            now = time.monotonic()
+            self._blocked = {
+                ip: entry for ip, entry in self._blocked.items() if entry[0] > now
+            }
+            if len(self._blocked) >= self.BLOCK_CACHE_SIZE:
+                return
+        self._blocked[client_ip] = (time.monotonic() + seconds, response)
 
     async def before_request(self, request):
         client = request.scope.get("client") or ("unknown", 0)
         client_ip = client[0]
-        now = datetime.utcnow()
 
-        window_start_cutoff = now - timedelta(seconds=self.WINDOW_SECONDS)
-        perma_window_cutoff = now - timedelta(hours=self.PERMA_WINDOW_HOURS)
+        cached = self._blocked.get(client_ip)
+        if cached is not None:
+            if time.monotonic() < cached[0]:
+                return cached[1]
+            del self._blocked[client_ip]
+
+        now = datetime.now(timezone.utc)
+
+        window_start_cutoff = now - self._window
+        perma_window_cutoff = now - self._perma_window
 
         key = client_ip  # one document per IP
 
+        # Fast path: an unblocked client inside an active window and under
+        # the limit only needs its counter bumped, so do that in one atomic
+        # round trip. Anything else (new window, limit hit, blocked) falls
+        # through to the full check below.
+        try:
+            allowed = await self.collection.find_one_and_update(
+                {
+                    "_id": key,
+                    "window_start": {"$gte": window_start_cutoff},
+                    "count": {"$lt": self.MAX_REQUESTS},
+                    "permanent_blocked": {"$ne": True},
+                    "$or": [
+                        {"blocked_until": None},
+                        {"blocked_until": {"$lte": now}},
+                    ],
+                },
+                {"$inc": {"count": 1}},
+                projection={"_id": 1},
+            )
+        except PyMongoError:
+            # If Mongo is unhappy, don't take the whole app down.
+            return None
+        if allowed is not None:
+            return None  # allow request
+
         try:
             doc = await self.collection.find_one({"_id": key})
         except PyMongoError:
@@ -51,11 +105,13 @@ class MongoRateLimitMiddleware(HttpMiddleware):
 
         # 0. Permanent block check
         if doc and doc.get("permanent_blocked"):
-            return {
+            response = {
                 "status_code": 403,
                 "body": f"Access permanently blocked for IP {client_ip}.",
                 "headers": [],
             }
+            self._remember_block(client_ip, response, self.PERMA_CACHE_SECONDS)
+            return response
 
         # 1. Temporary block check
         if doc:
@@ -65,11 +121,15 @@ class MongoRateLimitMiddleware(HttpMiddleware):
                 and isinstance(blocked_until, datetime)
                 and now < blocked_until
             ):
-                return {
+                response = {
                     "status_code": 429,
                     "body": f"Too many requests from {client_ip}. Temporarily blocked.",
                     "headers": [],
                 }
+                self._remember_block(
+                    client_ip, response, (blocked_until - now).total_seconds()
+                )
+                return response
 
         # 2. New window if no doc or window expired
         if (
@@ -129,9 +189,7 @@ class MongoRateLimitMiddleware(HttpMiddleware):
 
             # Temporary block if too many violations overall
             if violations >= self.BLOCK_AFTER_VIOLATIONS:
-                update_fields["blocked_until"] = now + timedelta(
-                    seconds=self.BLOCK_FOR_SECONDS
-                )
+                update_fields["blocked_until"] = now + self._block_for
 
             # Permanent block if too many violations in last 24 hours
             if violation_count_window >= self.PERMA_BLOCK_AFTER:
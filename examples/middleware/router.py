@@ -12,8 +12,8 @@ from micropie import App, HttpMiddleware, Request
 
 class ExplicitRouter(HttpMiddleware):
     def __init__(self):
-        # Map route paths to (method, regex pattern, handler name)
-        self.routes: Dict[str, Tuple[str, str, str]] = {}
+        # Map route paths to (method, compiled regex, handler name)
+        self.routes: Dict[str, Tuple[str, re.Pattern, str]] = {}
 
     def add_route(self, path: str, handler_name: str, method: str = "GET") -> None:
         """
@@ -25,8 +25,8 @@ class ExplicitRouter(HttpMiddleware):
             method: The HTTP method (e.g., "GET", "POST")
         """
         pattern = re.sub(r"{([^}]+)}", r"([^/]+)", path)
-        pattern = f"^{pattern}$"
-        self.routes[path] = (method, pattern, handler_name)
+        # Compile once here rather than going through re.match() per request
+        self.routes[path] = (method, re.compile(f"^{pattern}$"), handler_name)
 
     async def before_request(self, request: Request) -> Optional[Dict]:
         """
@@ -43,7 +43,7 @@ class ExplicitRouter(HttpMiddleware):
         for route_path, (method, pattern, handler_name) in self.routes.items():
             if request.method != method:
                 continue
-            match = re.match(pattern, path)
+            match = pattern.match(path)
             if match:
                 # Ensure path parameters are strings
                 request.path_params = [str(param) for param in match.groups()]
@@ -3,33 +3,51 @@ import asyncio
 
 MAX_UPLOAD_SIZE = 100 * 1024 * 1024  # 100MB
 
+# The upload form never changes, so encode it once at import time
+INDEX_HTML = b"""<html>
+<head><title>File Upload</title></head>
+<body>
+    <h2>Upload a File</h2>
+    <form action="/upload" method="post" enctype="multipart/form-data">
+        <input type="file" name="file"><br><br>
+        <input type="submit" value="Upload">
+    </form>
+</body>
+</html>"""
+
+TOO_LARGE = {
+    "status_code": 413,
+    "body": "413 Payload Too Large: Uploaded file exceeds size limit.",
+}
+
 
 class MaxUploadSizeMiddleware(HttpMiddleware):
+    """
+    Reject uploads whose declared Content-Length is over the limit. MicroPie
+    starts parsing multipart bodies alongside the middleware, so this is
+    only a fast path for honest clients: a missing or understated
+    Content-Length is caught by the running total in the upload handler.
+    """
+
     async def before_request(self, request):
         # Check if we're dealing with a POST, PUT, or PATCH request
         if request.method in ("POST", "PUT", "PATCH"):
             content_length = request.headers.get("content-length")
-            # Ensure Content-Length is present and valid
             if content_length is None:
-                return {
-                    "status_code": 400,
-                    "body": "400 Bad Request: Missing Content-Length header",
-                }
+                # Chunked upload: the handler enforces the limit as it streams
+                return None
             try:
-                content_length = int(content_length)
-                if content_length > MAX_UPLOAD_SIZE:
-                    print(
-                        f"Upload rejected: Content-Length ({content_length}) exceeds {MAX_UPLOAD_SIZE} bytes"
-                    )
-                    return {
-                        "status_code": 413,
-                        "body": "413 Payload Too Large: Uploaded file exceeds size limit.",
-                    }
+                declared_size = int(content_length)
             except ValueError:
                 return {
                     "status_code": 400,
                     "body": "400 Bad Request: Invalid Content-Length header",
                 }
+            if declared_size > MAX_UPLOAD_SIZE:
+                print(
+                    f"Upload rejected: Content-Length ({content_length}) exceeds {MAX_UPLOAD_SIZE} bytes"
+                )
+                return TOO_LARGE
         # Continue processing if checks pass
         return None
 
@@ -40,20 +58,7 @@ class MaxUploadSizeMiddleware(HttpMiddleware):
 class FileUploadApp(App):
     async def index(self):
         """Serves an HTML form for file uploads."""
-        return (
-            200,
-            """<html>
-<head><title>File Upload</title></head>
-<body>
-    <h2>Upload a File</h2>
-    <form action="/upload" method="post" enctype="multipart/form-data">
-        <input type="file" name="file"><br><br>
-        <input type="submit" value="Upload">
-    </form>
-</body>
-</html>""",
-            [("Content-Type", "text/html; charset=utf-8")],
-        )
+        return INDEX_HTML
 
     async def upload(self, file):
         """Handles file uploads and processes the file content."""
@@ -61,13 +66,20 @@ class FileUploadApp(App):
         content_type = file["content_type"]
         content_queue = file["content"]
 
-        # Process file content from the queue
+        # Process file content from the queue, keeping a running total so
+        # the limit holds even if Content-Length was missing or wrong
         total_size = 0
         while True:
             chunk = await content_queue.get()
             if chunk is None:  # End of file
                 break
             total_size += len(chunk)
+            if total_size > MAX_UPLOAD_SIZE:
+                # Keep draining so the parser can finish, but stop using
+                # the data: memory stays at one chunk however much is sent
+                while await content_queue.get() is not None:
+                    pass
+                return TOO_LARGE["status_code"], TOO_LARGE["body"]
             # Example: Process chunk (e.g., save to disk, validate, etc.)
             # For demonstration, just count the size
         return {"filename": filename, "content_type": content_type, "size": total_size}
@@ -3,6 +3,44 @@ from collections import deque
 import json
 import asyncio
 
+# Inline HTML for demo purposes, encoded once at import time
+INDEX_HTML = """
+<!doctype html>
+<title>Micropie Chat SSE</title>
+<h1>Micropie Chat SSE Demo</h1>
+<form id="chat-form">
+  Name: <input id="username" value="Anonymous" size="10">
+  <input id="message" autocomplete="off" size="40">
+  <button>Send</button>
+</form>
+<pre id="log"></pre>
+<script>
+const log = document.getElementById('log');
+const usernameInput = document.getElementById('username');
+const messageInput = document.getElementById('message');
+const form = document.getElementById('chat-form');
+
+const evtSource = new EventSource('/events');
+evtSource.onmessage = function(event) {
+  const data = JSON.parse(event.data);
+  log.textContent += data.username + ": " + data.message + "\\n";
+};
+
+form.onsubmit = async function(e) {
+  e.preventDefault();
+  await fetch('/send', {
+    method: 'POST',
+    headers: {'Content-Type': 'application/json'},
+    body: JSON.stringify({
+      username: usernameInput.value,
+      message: messageInput.value,
+    })
+  });
+  messageInput.value = "";
+};
+</script>
+""".encode("utf-8")
+
 
 class ChatApp(App):
     def __init__(self):
@@ -11,44 +49,7 @@ class ChatApp(App):
         self.clients = set()
 
     async def index(self):
-        # Inline HTML for demo purposes
-        html = """
-        <!doctype html>
-        <title>Micropie Chat SSE</title>
-        <h1>Micropie Chat SSE Demo</h1>
-        <form id="chat-form">
-          Name: <input id="username" value="Anonymous" size="10">
-          <input id="message" autocomplete="off" size="40">
-          <button>Send</button>
-        </form>
-        <pre id="log"></pre>
-        <script>
-        const log = document.getElementById('log');
-        const usernameInput = document.getElementById('username');
-        const messageInput = document.getElementById('message');
-        const form = document.getElementById('chat-form');
-
-        const evtSource = new EventSource('/events');
-        evtSource.onmessage = function(event) {
-          const data = JSON.parse(event.data);
-          log.textContent += data.username + ": " + data.message + "\\n";
-        };
-
-        form.onsubmit = async function(e) {
-          e.preventDefault();
-          await fetch('/send', {
-            method: 'POST',
-            headers: {'Content-Type': 'application/json'},
-            body: JSON.stringify({
-              username: usernameInput.value,
-              message: messageInput.value,
-            })
-          });
-          messageInput.value = "";
-        };
-        </script>
-        """
-        return 200, html, [("Content-Type", "text/html")]
+        return 200, INDEX_HTML, [("Content-Type", "text/html")]
 
     async def send(self):
         data = self.request.get_json
@@ -57,12 +58,11 @@ class ChatApp(App):
         if message.strip():
             msg = {"username": username, "message": message}
             self.messages.append(msg)
-            # Broadcast to all connected clients
-            for client in self.clients.copy():
-                try:
-                    await client.put(json.dumps(msg))
-                except Exception:
-                    self.clients.discard(client)
+            # Broadcast to all connected clients: encode once, and since the
+            # client queues are unbounded, enqueue without awaiting each one
+            payload = json.dumps(msg)
+            for client in tuple(self.clients):
+                client.put_nowait(payload)
         return 200, {"status": "success"}
 
     async def events(self):
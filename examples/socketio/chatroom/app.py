@@ -94,14 +94,8 @@ async def join_channel(sid, data):
 
     # Send recent messages for this channel
     try:
-        # Get all messages with type="message"
-        all_messages = db.search(
-            "type", "message", limit=1000
-        )  # Use a high limit to ensure we get all messages
-        # Filter messages for the specific channel
-        recent_messages = [
-            msg for msg in all_messages if msg.get("channel") == channel
-        ][:50]  # Limit to 50
+        # Let KenobiDB filter by channel instead of scanning every message
+        recent_messages = db.search("channel", channel, limit=50)
         print(f"Retrieved {len(recent_messages)} recent messages for channel {channel}")
         for msg in recent_messages:
             await sio.emit(
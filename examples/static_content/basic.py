@@ -2,6 +2,13 @@ from micropie import App
 import os
 import aiofiles
 import mimetypes
+from collections import OrderedDict
+
+# Small files are kept in memory so hot assets (CSS, JS, icons) are served
+# without reopening and rereading them on every request
+STATIC_CACHE_MAX_FILE = 256 * 1024  # only cache files up to 256KB
+STATIC_CACHE_MAX_ENTRIES = 512
+_static_cache = OrderedDict()  # path -> (mtime_ns, size, content_type, data)
 
 
 class Root(App):
@@ -13,20 +20,47 @@ class Root(App):
         if not file_path.startswith(static_dir):
             return 403, "Forbidden", []
 
-        if os.path.exists(file_path):
-            # Determine the appropriate Content-Type based on file extension
-            content_type, _ = mimetypes.guess_type(file_path)
-            if content_type is None:
-                content_type = "application/octet-stream"
+        try:
+            st = os.stat(file_path)
+        except OSError:
+            _static_cache.pop(file_path, None)
+            return 404, "Not Found", []
+
+        # Serve from memory if the file hasn't changed since it was cached
+        cached = _static_cache.get(file_path)
+        if cached and cached[:2] == (st.st_mtime_ns, st.st_size):
+            _static_cache.move_to_end(file_path)
+            return 200, cached[3], [("Content-Type", cached[2])]
+
+        # Determine the appropriate Content-Type based on file extension
+        content_type, _ = mimetypes.guess_type(file_path)
+        if content_type is None:
+            content_type = "application/octet-stream"
+
+        if st.st_size <= STATIC_CACHE_MAX_FILE:
+            async with aiofiles.open(file_path, "rb") as f:
+                data = await f.read()
+            _static_cache[file_path] = (
+                st.st_mtime_ns,
+                st.st_size,
+                content_type,
+                data,
+            )
+            _static_cache.move_to_end(file_path)
+            if len(_static_cache) > STATIC_CACHE_MAX_ENTRIES:
+                _static_cache.popitem(last=False)  # least recently used
+            return 200, data, [("Content-Type", content_type)]
+
+        # The file grew past the cache limit; don't keep the old copy
+        _static_cache.pop(file_path, None)
 
-            # Stream the file content to reduce memory usage
-            async def stream_file():
-                async with aiofiles.open(file_path, "rb") as f:
-                    while chunk := await f.read(65536):  # Read in 64KB chunks
-                        yield chunk
+        # Stream the file content to reduce memory usage
+        async def stream_file():
+            async with aiofiles.open(file_path, "rb") as f:
+                while chunk := await f.read(65536):  # Read in 64KB chunks
+                    yield chunk
 
-            return 200, stream_file(), [("Content-Type", content_type)]
-        return 404, "Not Found", []
+        return 200, stream_file(), [("Content-Type", content_type)]
 
 
 app = Root()
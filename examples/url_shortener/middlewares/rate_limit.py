@@ -1,7 +1,8 @@
 from __future__ import annotations
 
 import ipaddress
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
 from typing import Set, Iterable
 
 from pymongo import AsyncMongoClient, ReturnDocument
@@ -13,6 +14,7 @@ from micropie import HttpMiddleware
 # ---------------------------------------------------------------------------
 
 
+@lru_cache(maxsize=4096)
 def _valid_ip(value: str | None) -> str | None:
     """Parse and normalize an IP string, returning canonical string form or None."""
     try:
@@ -55,6 +57,7 @@ _CLOUDFLARE_IP_RANGES: list[str] = [
 _CLOUDFLARE_NETWORKS = [ipaddress.ip_network(n) for n in _CLOUDFLARE_IP_RANGES]
 
 
+@lru_cache(maxsize=4096)
 def _is_cloudflare_socket_ip(socket_ip: str | None) -> bool:
     """
     Returns True if the connecting socket IP belongs to Cloudflare's published ranges.
@@ -123,9 +126,13 @@ class MongoRateLimitMiddleware(HttpMiddleware):
         # If we can't reliably identify the client, return 403 (recommended)
         fail_closed: bool = True,
     ):
-        self.client = AsyncMongoClient(mongo_uri)
+        self.client = AsyncMongoClient(mongo_uri, tz_aware=True)
         self.db = self.client[db_name]
         self.collection = self.db[collection_name]
+        # Window lengths as timedeltas, built once instead of per request
+        self._window = timedelta(seconds=self.WINDOW_SECONDS)
+        self._perma_window = timedelta(hours=self.PERMA_WINDOW_HOURS)
+        self._block_for = timedelta(seconds=self.BLOCK_FOR_SECONDS)
 
         self.allowed_hosts = set(h.lower() for h in (allowed_hosts or set()))
         self.trust_proxy_headers = trust_proxy_headers
@@ -223,10 +230,10 @@ class MongoRateLimitMiddleware(HttpMiddleware):
                 return {"status_code": 403, "body": "Forbidden.", "headers": []}
             return None  # fail open (not recommended)
 
-        now = datetime.utcnow()
+        now = datetime.now(timezone.utc)
 
-        window_start_cutoff = now - timedelta(seconds=self.WINDOW_SECONDS)
-        perma_window_cutoff = now - timedelta(hours=self.PERMA_WINDOW_HOURS)
+        window_start_cutoff = now - self._window
+        perma_window_cutoff = now - self._perma_window
 
         key = self._key(client_ip, request)
 
@@ -359,7 +366,7 @@ class MongoRateLimitMiddleware(HttpMiddleware):
                                         },
                                     ]
                                 },
-                                now + timedelta(seconds=self.BLOCK_FOR_SECONDS),
+                                now + self._block_for,
                                 "$blocked_until",
                             ]
                         }
@@ -12,13 +12,26 @@ __license__ = "BSD3"
 
 import asyncio
 import contextvars
+import heapq
 import inspect
 import re
+import secrets
 import time
 import traceback
-import uuid
 from abc import ABC, abstractmethod
-from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional, Tuple
+from collections import OrderedDict
+from functools import lru_cache
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+)
 from urllib.parse import parse_qs, urlsplit, urlunsplit, quote
 
 try:
@@ -54,6 +67,29 @@ _DEFAULT_HEADER_BYTES = (b"Content-Type", b"text/html; charset=utf-8")
 _JSON_HEADER_BYTES = (b"Content-Type", b"application/json")
 _DEFAULT_HEADERS_BYTES = [_DEFAULT_HEADER_BYTES]
 _JSON_HEADERS_BYTES = [_JSON_HEADER_BYTES]
+_BOUNDARY_RE = re.compile(r"boundary=([^;]+)")
+# Query strings up to this many bytes have their parsed form cached
+_QUERY_CACHE_MAX_LEN = 256
+# Upper bound on distinct header sets remembered by _prepare_response_headers
+_HEADER_CACHE_MAX = 256
+# Headers whose values are usually unique per response and not worth caching
+_UNCACHED_HEADERS = frozenset(
+    (
+        "set-cookie",
+        "location",
+        "retry-after",
+        "content-length",
+        "etag",
+        "last-modified",
+        "content-disposition",
+    )
+)
+
+
+@lru_cache(maxsize=1024)
+def _parse_query_cached(query_string: bytes) -> Dict[str, List[str]]:
+    """Parse a short, frequently repeated query string once."""
+    return parse_qs(query_string.decode("utf-8", "ignore"))
 
 
 class _HandlerParam(NamedTuple):
@@ -99,11 +135,19 @@ class SessionBackend(ABC):
 
 
 class InMemorySessionBackend(SessionBackend):
-    def __init__(self):
+    def __init__(self, max_sessions: Optional[int] = None):
+        # Sessions are kept in least-recently-used order when max_sessions
+        # is set, so the oldest can be evicted once the cap is reached
+        self.max_sessions: Optional[int] = max_sessions
         self.sessions: Dict[str, Dict[str, Any]] = {}
         self.last_access: Dict[str, float] = {}
         self._next_cleanup: float = 0.0
         self._cleanup_interval: float = 60.0
+        # Min-heap of (expiry, session_id) with one entry per session, so
+        # cleanup only visits sessions that may have expired. Entries are
+        # not updated on access; a stale one is re-pushed when it surfaces.
+        self._expiry_heap: List[Tuple[float, str]] = []
+        self._scheduled: Set[str] = set()
 
     def _cleanup(self, now: Optional[float] = None, *, force: bool = False):
         """Remove expired sessions based on SESSION_TIMEOUT."""
@@ -112,12 +156,20 @@ class InMemorySessionBackend(SessionBackend):
         if not force and now < self._next_cleanup:
             return
         self._next_cleanup = now + self._cleanup_interval
-        expired = [
-            sid for sid, ts in self.last_access.items() if now - ts >= SESSION_TIMEOUT
-        ]
-        for sid in expired:
-            self.sessions.pop(sid, None)
-            self.last_access.pop(sid, None)
+        heap = self._expiry_heap
+        while heap and heap[0][0] <= now:
+            _, sid = heapq.heappop(heap)
+            last_access = self.last_access.get(sid)
+            if last_access is None:
+                # Already deleted
+                self._scheduled.discard(sid)
+            elif now - last_access >= SESSION_TIMEOUT:
+                self.sessions.pop(sid, None)
+                self.last_access.pop(sid, None)
+                self._scheduled.discard(sid)
+            else:
+                # Accessed since it was scheduled; check again later
+                heapq.heappush(heap, (last_access + SESSION_TIMEOUT, sid))
 
     async def load(self, session_id: str) -> Dict[str, Any]:
         now = time.time()
@@ -129,6 +181,9 @@ class InMemorySessionBackend(SessionBackend):
                 self.last_access.pop(session_id, None)
                 return {}
             self.last_access[session_id] = now
+            if self.max_sessions is not None and session_id in self.sessions:
+                # Mark as most recently used
+                self.sessions[session_id] = self.sessions.pop(session_id)
             return self.sessions.get(session_id, {})
         return {}
 
@@ -139,8 +194,31 @@ class InMemorySessionBackend(SessionBackend):
             self.sessions.pop(session_id, None)
             self.last_access.pop(session_id, None)
         else:
+            now = time.time()
+            if self.max_sessions is not None:
+                self.sessions.pop(session_id, None)
             self.sessions[session_id] = data
-            self.last_access[session_id] = time.time()
+            self.last_access[session_id] = now
+            if self.max_sessions is not None:
+                while len(self.sessions) > self.max_sessions:
+                    oldest = next(iter(self.sessions))
+                    del self.sessions[oldest]
+                    self.last_access.pop(oldest, None)
+                    self._scheduled.discard(oldest)
+            if session_id not in self._scheduled:
+                self._scheduled.add(session_id)
+                heapq.heappush(self._expiry_heap, (now + SESSION_TIMEOUT, session_id))
+        if len(self._expiry_heap) > 2 * len(self.sessions):
+            self._compact()
+
+    def _compact(self) -> None:
+        """Drop heap entries for sessions that were evicted or deleted."""
+        self._expiry_heap = [
+            (last_access + SESSION_TIMEOUT, sid)
+            for sid, last_access in self.last_access.items()
+        ]
+        heapq.heapify(self._expiry_heap)
+        self._scheduled = set(self.last_access)
 
 
 # -----------------------------
@@ -366,6 +444,12 @@ class ConnectionClosed(Exception):
     pass
 
 
+class _BodyTooLarge(Exception):
+    """Raised by the multipart parser once a body passes max_body_size."""
+
+    pass
+
+
 # -----------------------------
 # Middleware Abstraction
 # -----------------------------
@@ -468,7 +552,15 @@ class App:
         self.ws_middlewares: List[WebSocketMiddleware] = []
         self.startup_handlers: List[Callable[[], Awaitable[None]]] = []
         self.shutdown_handlers: List[Callable[[], Awaitable[None]]] = []
+        # Largest request body (in bytes) read into memory; None means no limit
+        self.max_body_size: Optional[int] = None
         self._handler_cache: Dict[Any, _HandlerInfo] = {}
+        # Loaded templates, used only while `env.auto_reload` is off
+        self._templates: Dict[str, Any] = {}
+        self._templates_env: Any = None
+        self._header_cache: OrderedDict[
+            Tuple[Tuple[str, str], ...], Tuple[Tuple[bytes, bytes], ...]
+        ] = OrderedDict()
         self._started: bool = False
 
     @property
@@ -521,6 +613,9 @@ class App:
         query_string = scope.get("query_string", b"")
         if not query_string:
             return {}
+        if len(query_string) <= _QUERY_CACHE_MAX_LEN:
+            # Copy the value lists so handlers can't alter the cached result
+            return {k: v.copy() for k, v in _parse_query_cached(query_string).items()}
         return parse_qs(query_string.decode("utf-8", "ignore"))
 
     async def __call__(
@@ -614,6 +709,15 @@ class App:
             await self._send_response(send, code, body, headers or [])
             return
 
+        def _body_too_large() -> bool:
+            """Whether the background multipart parse stopped at max_body_size."""
+            return (
+                parse_task is not None
+                and parse_task.done()
+                and not parse_task.cancelled()
+                and isinstance(parse_task.exception(), _BodyTooLarge)
+            )
+
         async def _await_file_param(name: str) -> Optional[Any]:
             """
             Wait until a multipart file field named `name` is available in request.files,
@@ -644,31 +748,53 @@ class App:
                 and not request.body_parsed
                 and not request.body_params
             ):
+                max_body_size = self.max_body_size
+                if max_body_size is not None:
+                    content_length = request.headers.get("content-length", "")
+                    if (
+                        content_length.isascii()
+                        and content_length.isdigit()
+                        and int(content_length) > max_body_size
+                    ):
+                        await _early_exit(413, "413 Payload Too Large")
+                        return
                 if "multipart/form-data" in content_type:
                     if not MULTIPART_INSTALLED:
                         print("For multipart form data support install 'multipart'.")
                         await _early_exit(500, "500 Internal Server Error")
                         return
-                    boundary_match = re.search(r"boundary=([^;]+)", content_type)
+                    boundary_match = _BOUNDARY_RE.search(content_type)
                     if not boundary_match:
                         await _early_exit(400, "400 Bad Request: Missing boundary")
                         return
+                    # The boundary may be sent as a quoted-string
+                    boundary = boundary_match.group(1).strip().strip('"')
                     # Start parsing in the background; do NOT await here so handlers/middleware can run concurrently.
                     parse_task = asyncio.create_task(
                         self._parse_multipart_into_request(
                             receive,
-                            boundary_match.group(1).encode("utf-8"),
+                            boundary.encode("utf-8"),
                             request,
                             file_queue_maxsize=2048,
+                            max_body_size=max_body_size,
                         )
                     )
                 else:
                     body_chunks: List[bytes] = []
+                    body_size = 0
                     try:
                         async with asyncio.timeout(5):  # Timeout after 5 seconds
                             while True:
                                 msg = await receive()
                                 if chunk := msg.get("body", b""):
+                                    body_size += len(chunk)
+                                    # Content-Length may be missing or wrong
+                                    if (
+                                        max_body_size is not None
+                                        and body_size > max_body_size
+                                    ):
+                                        await _early_exit(413, "413 Payload Too Large")
+                                        return
                                     body_chunks.append(chunk)
                                 if not msg.get("more_body"):
                                     break
@@ -791,6 +917,9 @@ class App:
                     param_value = files[param.name]
                 elif is_multipart:
                     param_value = await _await_file_param(param.name)
+                    if _body_too_large():
+                        await _early_exit(413, "413 Payload Too Large")
+                        return
                     if param_value is None and param.default is _PARAM_EMPTY:
                         await _early_exit(
                             400,
@@ -829,13 +958,17 @@ class App:
                 try:
                     await parse_task
                     request.body_parsed = True
+                except _BodyTooLarge:
+                    await _early_exit(413, "413 Payload Too Large")
+                    return
                 except Exception:
                     traceback.print_exc()
 
             # Normalize response
             if isinstance(result, tuple):
                 status_code, response_body = result[0], result[1]
-                extra_headers = result[2] if len(result) > 2 else []
+                # Copy so handlers can return a shared, precomputed header list
+                extra_headers = list(result[2]) if len(result) > 2 else []
             else:
                 response_body = result
             if isinstance(response_body, (dict, list)):
@@ -859,7 +992,7 @@ class App:
             if request.session:
                 # New or updated session
                 if not session_id:
-                    session_id = str(uuid.uuid4())
+                    session_id = secrets.token_urlsafe(16)
                     extra_headers.append(
                         (
                             "Set-Cookie",
@@ -1037,7 +1170,7 @@ class App:
             # Set session ID if needed
             session_id = cookies.get("session_id")
             had_session_id = bool(session_id)
-            ws.session_id = session_id or str(uuid.uuid4())
+            ws.session_id = session_id or secrets.token_urlsafe(16)
 
             # Execute handler
             try:
@@ -1079,9 +1212,9 @@ class App:
         if not cookie_header:
             return cookies
         for cookie in cookie_header.split(";"):
-            if "=" in cookie:
-                k, v = cookie.strip().split("=", 1)
-                cookies[k] = v
+            name, sep, value = cookie.strip().partition("=")
+            if sep:
+                cookies[name] = value
         return cookies
 
     async def _parse_multipart_into_request(
@@ -1091,11 +1224,13 @@ class App:
         request: "Request",
         *,
         file_queue_maxsize: int = 2048,
+        max_body_size: Optional[int] = None,
     ) -> None:
         """
         Parse multipart directly from ASGI receive() and populate
         request.body_params / request.files as parts arrive.
         Uses bounded queues for file parts to apply backpressure.
+        Raises _BodyTooLarge once more than max_body_size bytes arrive.
         """
         if request.body_params is None:
             request.body_params = {}
@@ -1107,19 +1242,29 @@ class App:
             current_filename: Optional[str] = None
             current_content_type: Optional[str] = None
             current_queue: Optional[asyncio.Queue] = None
-            form_value: str = ""
+            # Text field chunks, decoded once at the end of the part so a
+            # multi-byte character split across chunks survives
+            form_chunks: List[bytes] = []
+            body_size = 0
 
             while True:
                 msg = await receive()
                 body_chunk = msg.get("body", b"")
                 if body_chunk:
+                    body_size += len(body_chunk)
+                    # Content-Length may be missing or wrong
+                    if max_body_size is not None and body_size > max_body_size:
+                        if current_queue:
+                            # Let a handler reading the file stream finish
+                            await current_queue.put(None)
+                        raise _BodyTooLarge()
                     for result in parser.parse(body_chunk):
                         if isinstance(result, MultipartSegment):
                             # New part
                             current_field_name = result.name
                             current_filename = result.filename
                             current_content_type = None
-                            form_value = ""
+                            form_chunks = []
 
                             # Close previous file stream if open
                             if current_queue:
@@ -1151,25 +1296,30 @@ class App:
                                 # May block here if handler isn't draining the queue
                                 await current_queue.put(result)
                             else:
-                                form_value += result.decode("utf-8", "ignore")
+                                form_chunks.append(result)
                         else:
                             # End of current part
                             if current_queue:
                                 await current_queue.put(None)
                                 current_queue = None
                             else:
+                                form_value = b"".join(form_chunks).decode(
+                                    "utf-8", "ignore"
+                                )
                                 if form_value and current_field_name:
                                     request.body_params[current_field_name].append(
                                         form_value
                                     )
-                                form_value = ""
+                                form_chunks = []
 
                 if not msg.get("more_body"):
                     break
 
             # Flush leftovers
-            if current_field_name and form_value and not current_filename:
-                request.body_params[current_field_name].append(form_value)
+            if current_field_name and form_chunks and not current_filename:
+                form_value = b"".join(form_chunks).decode("utf-8", "ignore")
+                if form_value:
+                    request.body_params[current_field_name].append(form_value)
             if current_queue:
                 await current_queue.put(None)
 
@@ -1184,17 +1334,38 @@ class App:
             if extra_headers[0] == _JSON_CONTENT_TYPE:
                 return _JSON_HEADERS_BYTES
 
+        # Most handlers return the same few header sets over and over, so
+        # remember the encoded result instead of rebuilding it per response
+        try:
+            cache_key = tuple(extra_headers)
+            cached = self._header_cache.get(cache_key)
+        except TypeError:  # unhashable entries, e.g. [name, value] lists
+            cache_key = cached = None
+        if cached is not None:
+            self._header_cache.move_to_end(cache_key)
+            # ASGI middleware may edit message["headers"] in place
+            return list(cached)
+
         sanitized_headers: List[Tuple[bytes, bytes]] = []
         has_content_type = False
+        cacheable = cache_key is not None
         for k, v in extra_headers:
             if "\n" in k or "\r" in k or "\n" in v or "\r" in v:
                 print(f"Header injection attempt detected: {k}: {v}")
+                cacheable = False  # keep reporting repeated attempts
                 continue
-            if k.lower() == "content-type":
+            name = k.lower()
+            if name == "content-type":
                 has_content_type = True
+            elif name in _UNCACHED_HEADERS:
+                cacheable = False
             sanitized_headers.append((k.encode("latin-1"), v.encode("latin-1")))
         if not has_content_type:
             sanitized_headers.append(_DEFAULT_HEADER_BYTES)
+        if cacheable:
+            self._header_cache[cache_key] = tuple(sanitized_headers)
+            if len(self._header_cache) > _HEADER_CACHE_MAX:
+                self._header_cache.popitem(last=False)
         return sanitized_headers
 
     async def _send_response(
@@ -1300,5 +1471,15 @@ class App:
             print("To use the `_render_template` method install 'jinja2'.")
             return "500 Internal Server Error: Jinja2 not installed."
         assert self.env is not None
-        template = await asyncio.to_thread(self.env.get_template, name)
+        reload = self.env.auto_reload
+        if self._templates_env is not self.env:
+            # `app.env` was replaced; templates from the old one are stale
+            self._templates.clear()
+            self._templates_env = self.env
+        template = None if reload else self._templates.get(name)
+        if template is None:
+            template = await asyncio.to_thread(self.env.get_template, name)
+            if not reload:
+                # Later renders skip the worker thread hop entirely
+                self._templates[name] = template
         return await template.render_async(**kwargs)
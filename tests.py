@@ -1,5 +1,7 @@
 import asyncio
 import json as std_json
+import os
+import tempfile
 import unittest
 import uuid
 from unittest.mock import AsyncMock, patch
@@ -12,6 +14,8 @@ from micropie import (
     SESSION_TIMEOUT,
     ConnectionClosed,
     HttpMiddleware,
+    JINJA_INSTALLED,
+    MULTIPART_INSTALLED,
 )
 
 
@@ -176,6 +180,43 @@ class TestSession(MicroPieTestCase):
         expired_data = await backend.load(session_id)
         self.assertEqual(expired_data, {}, "Expired session should return empty dict")
 
+    async def test_in_memory_session_cleanup(self):
+        """Cleanup drops expired sessions and keeps recently used ones."""
+        backend = InMemorySessionBackend()
+        await backend.save("old", {"n": 1}, SESSION_TIMEOUT)
+        await backend.save("fresh", {"n": 2}, SESSION_TIMEOUT)
+        backend.last_access["old"] = 0
+        now = backend.last_access["fresh"] + SESSION_TIMEOUT - 1
+
+        backend._cleanup(now + 2, force=True)
+        self.assertNotIn("old", backend.sessions)
+        self.assertNotIn("fresh", backend.sessions)
+
+        await backend.save("fresh", {"n": 2}, SESSION_TIMEOUT)
+        backend.last_access["fresh"] = now  # used again just before expiry
+        backend._cleanup(now + 2, force=True)
+        self.assertIn("fresh", backend.sessions)
+        self.assertEqual(len(backend._expiry_heap), 1)
+
+    async def test_in_memory_session_max_sessions(self):
+        """The least recently used session is evicted past max_sessions."""
+        backend = InMemorySessionBackend(max_sessions=2)
+        await backend.save("a", {"n": 1}, SESSION_TIMEOUT)
+        await backend.save("b", {"n": 2}, SESSION_TIMEOUT)
+        await backend.load("a")  # "b" is now the least recently used
+        await backend.save("c", {"n": 3}, SESSION_TIMEOUT)
+
+        self.assertEqual(list(backend.sessions), ["a", "c"])
+        self.assertNotIn("b", backend.last_access)
+        self.assertEqual(await backend.load("b"), {})
+
+        # Evicted ids do not pile up in the expiry bookkeeping
+        for i in range(1000):
+            await backend.save(f"flood{i}", {"n": i}, SESSION_TIMEOUT)
+        self.assertEqual(len(backend.sessions), 2)
+        self.assertLessEqual(len(backend._expiry_heap), 4)
+        self.assertLessEqual(len(backend._scheduled), 4)
+
     async def test_cookie_parsing(self):
         """Test parsing of cookie header."""
         cookie_header = "session_id=abc123; theme=dark; user=john"
@@ -185,6 +226,11 @@ class TestSession(MicroPieTestCase):
             {"session_id": "abc123", "theme": "dark", "user": "john"},
             "Cookies should be parsed correctly",
         )
+        self.assertEqual(
+            self.app._parse_cookies("flag; token=a=b;session_id=xyz"),
+            {"token": "a=b", "session_id": "xyz"},
+            "Values keep '=' and pairs without one are skipped",
+        )
         self.assertEqual(
             self.app._parse_cookies(""),
             {},
@@ -387,6 +433,49 @@ class TestFastPaths(MicroPieTestCase):
 
         send.assert_any_call({"type": "websocket.send", "text": "lobby:alice"})
 
+    async def test_query_string_cache_returns_copies(self):
+        """Cached query parsing must not leak mutations between requests."""
+        scope = self.create_mock_scope(query_string=b"tag=a&tag=b")
+        first = self.app._parse_query_string(scope)
+        first["tag"].append("c")
+        first["extra"] = ["x"]
+        self.assertEqual(self.app._parse_query_string(scope), {"tag": ["a", "b"]})
+
+    async def test_response_header_cache(self):
+        """Repeated header sets are encoded once; per-user ones are not kept."""
+        headers = [("X-Frame-Options", "DENY")]
+        first = self.app._prepare_response_headers(headers)
+        self.assertEqual(
+            first,
+            [
+                (b"X-Frame-Options", b"DENY"),
+                (b"Content-Type", b"text/html; charset=utf-8"),
+            ],
+        )
+        self.assertIn(tuple(headers), self.app._header_cache)
+        second = self.app._prepare_response_headers(list(headers))
+        self.assertEqual(second, first)
+        # Outer ASGI middleware may edit the list; later responses must not see it
+        second.append((b"Content-Encoding", b"gzip"))
+        self.assertEqual(self.app._prepare_response_headers(headers), first)
+
+        cookie = [("Set-Cookie", "session_id=abc; Path=/")]
+        self.app._prepare_response_headers(cookie)
+        self.assertNotIn(tuple(cookie), self.app._header_cache)
+        retry = [("Retry-After", "30")]
+        self.app._prepare_response_headers(retry)
+        self.assertNotIn(tuple(retry), self.app._header_cache)
+
+        # Least recently used sets are evicted, so new ones still get cached
+        for i in range(300):
+            self.app._prepare_response_headers([("X-Request", str(i))])
+            self.app._prepare_response_headers(headers)
+        self.assertIn(tuple(headers), self.app._header_cache)
+        self.assertNotIn((("X-Request", "0"),), self.app._header_cache)
+        static = [("X-Frame-Options", "DENY"), ("Content-Type", "text/css")]
+        self.app._prepare_response_headers(static)
+        self.assertIn(tuple(static), self.app._header_cache)
+
 
 class TestRouting(MicroPieTestCase):
     """Tests for HTTP and WebSocket routing."""
@@ -654,6 +743,44 @@ class TestResponseHandling(MicroPieTestCase):
             }
         )
 
+    async def test_max_body_size(self):
+        """Bodies over max_body_size are rejected with 413."""
+        self.app.max_body_size = 8
+
+        async def index(self):
+            return "OK"
+
+        setattr(self.app, "index", index.__get__(self.app, App))
+
+        for headers, chunks in (
+            # Declared size is over the limit: rejected before reading
+            ([(b"content-length", b"20")], [b"x" * 20]),
+            # No Content-Length: rejected once the running total passes it
+            ([], [b"x" * 5, b"x" * 5]),
+            # Non-ASCII digits are not a usable Content-Length
+            ([(b"content-length", "²".encode("utf-8"))], [b"x" * 5, b"x" * 5]),
+        ):
+            scope = self.create_mock_scope(
+                path="/index",
+                method="POST",
+                headers=[(b"content-type", b"text/plain")] + headers,
+            )
+            receive = AsyncMock(
+                side_effect=[
+                    {
+                        "type": "http.request",
+                        "body": chunk,
+                        "more_body": i < len(chunks) - 1,
+                    }
+                    for i, chunk in enumerate(chunks)
+                ]
+            )
+            send = AsyncMock()
+
+            await self.app(scope, receive, send)
+
+            self.assertEqual(send.call_args_list[0][0][0]["status"], 413)
+
     async def test_header_injection(self):
         """Test protection against header injection."""
 
@@ -687,6 +814,28 @@ class TestResponseHandling(MicroPieTestCase):
             {"type": "http.response.body", "body": b"Test", "more_body": False}
         )
 
+    async def test_shared_header_list_not_mutated(self):
+        """Headers returned by a handler should not be appended to in place."""
+        shared_headers = [("X-Frame-Options", "DENY")]
+
+        async def index(self):
+            self.request.session["user"] = "alice"
+            return 200, {"ok": True}, shared_headers
+
+        setattr(self.app, "index", index.__get__(self.app, App))
+
+        for _ in range(2):
+            scope = self.create_mock_scope(path="/index")
+            receive = AsyncMock(
+                return_value={"type": "http.request", "body": b"", "more_body": False}
+            )
+            send = AsyncMock()
+            await self.app(scope, receive, send)
+
+        self.assertEqual(shared_headers, [("X-Frame-Options", "DENY")])
+        start_call = send.call_args_list[0][0][0]
+        self.assertIn((b"Content-Type", b"application/json"), start_call["headers"])
+
     async def test_redirect(self):
         """Test redirect response generation."""
         location = "/new-page"
@@ -767,6 +916,133 @@ class TestOptionalDependencies(MicroPieTestCase):
                 }
             )
 
+    @unittest.skipUnless(MULTIPART_INSTALLED, "multipart is not installed")
+    async def test_multipart_text_field(self):
+        """Text fields survive split characters and quoted boundaries."""
+        body = (
+            b"--b\r\n"
+            b'Content-Disposition: form-data; name="greeting"\r\n\r\n'
+            + "héllo".encode("utf-8")
+            + b"\r\n--b--\r\n"
+        )
+        split = body.index("é".encode("utf-8")) + 1  # inside the "é"
+        chunks = [body[:split], body[split:]]
+        receive = AsyncMock(
+            side_effect=[
+                {
+                    "type": "http.request",
+                    "body": chunk,
+                    "more_body": i < len(chunks) - 1,
+                }
+                for i, chunk in enumerate(chunks)
+            ]
+        )
+        request = Request(self.create_mock_scope(method="POST"))
+
+        await self.app._parse_multipart_into_request(receive, b"b", request)
+
+        self.assertEqual(request.body_params, {"greeting": ["héllo"]})
+
+        # The boundary parameter may be sent as a quoted-string
+        async def index(self, upload):
+            chunks = []
+            while (chunk := await upload["content"].get()) is not None:
+                chunks.append(chunk)
+            return b"".join(chunks)
+
+        setattr(self.app, "index", index.__get__(self.app, App))
+        scope = self.create_mock_scope(
+            path="/index",
+            method="POST",
+            headers=[(b"content-type", b'multipart/form-data; boundary="b"')],
+        )
+        body = (
+            b"--b\r\n"
+            b'Content-Disposition: form-data; name="upload"; filename="a.txt"\r\n'
+            b"\r\nfile data\r\n--b--\r\n"
+        )
+        receive = AsyncMock(
+            side_effect=[{"type": "http.request", "body": body, "more_body": False}]
+        )
+        send = AsyncMock()
+
+        await self.app(scope, receive, send)
+
+        self.assertEqual(send.call_args_list[0][0][0]["status"], 200)
+        self.assertEqual(send.call_args_list[1][0][0]["body"], b"file data")
+
+    @unittest.skipUnless(MULTIPART_INSTALLED, "multipart is not installed")
+    async def test_multipart_max_body_size(self):
+        """Multipart bodies without Content-Length still honour max_body_size."""
+        self.app.max_body_size = 8
+
+        async def index(self):
+            return "OK"
+
+        setattr(self.app, "index", index.__get__(self.app, App))
+        scope = self.create_mock_scope(
+            path="/index",
+            method="POST",
+            headers=[(b"content-type", b"multipart/form-data; boundary=b")],
+        )
+        chunks = [
+            b'--b\r\nContent-Disposition: form-data; name="text"\r\n\r\n',
+            b"x" * 100_000,
+            b"\r\n--b--\r\n",
+        ]
+        receive = AsyncMock(
+            side_effect=[
+                {
+                    "type": "http.request",
+                    "body": chunk,
+                    "more_body": i < len(chunks) - 1,
+                }
+                for i, chunk in enumerate(chunks)
+            ]
+        )
+        send = AsyncMock()
+
+        await self.app(scope, receive, send)
+
+        self.assertEqual(send.call_args_list[0][0][0]["status"], 413)
+        # Parsing stopped at the first chunk over the limit
+        self.assertEqual(receive.await_count, 1)
+
+    @unittest.skipUnless(JINJA_INSTALLED, "jinja2 is not installed")
+    async def test_template_cache(self):
+        """Templates load once with auto_reload off and reload when it is on."""
+        from jinja2 import FileSystemLoader
+
+        with tempfile.TemporaryDirectory() as template_dir:
+            path = os.path.join(template_dir, "page.html")
+            with open(path, "w") as f:
+                f.write("v1 {{ user }}")
+            self.app.env.loader = FileSystemLoader(template_dir)
+            self.assertTrue(self.app.env.auto_reload)  # Jinja2's default
+
+            self.app.env.auto_reload = False
+            with patch.object(
+                self.app.env, "get_template", wraps=self.app.env.get_template
+            ) as get_template:
+                self.assertEqual(
+                    await self.app._render_template("page.html", user="a"), "v1 a"
+                )
+                self.assertEqual(
+                    await self.app._render_template("page.html", user="b"), "v1 b"
+                )
+                self.assertEqual(get_template.call_count, 1)
+
+            with open(path, "w") as f:
+                f.write("v2 {{ user }}")
+            os.utime(path, (0, os.path.getmtime(path) + 10))
+            self.assertEqual(
+                await self.app._render_template("page.html", user="c"), "v1 c"
+            )
+            self.app.env.auto_reload = True
+            self.assertEqual(
+                await self.app._render_template("page.html", user="d"), "v2 d"
+            )
+
 
 if __name__ == "__main__":
     unittest.main()